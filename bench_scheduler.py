@@ -0,0 +1,121 @@
+"""Mixed-workload benchmark for the job scheduler.
+
+Replays the same simulated workload twice, once first-come-first-served and
+once through the size-aware fair scheduler. The workload is a few long
+uploads from one client plus a stream of short clips from other clients.
+Stage times scale with video length, as CloudConvert and Whisper do, and
+simulated time runs much faster than real time.
+
+    python bench_scheduler.py
+    python bench_scheduler.py --long-jobs 3 --short-jobs 80 --seed 7
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+from scheduler import Scheduler
+
+STAGE_LIMITS = {"convert": 4, "transcribe": 4, "summarize": 8}
+
+# Simulated seconds of work per second of video, per stage (summarize is per job)
+CONVERT_FACTOR = 0.3
+TRANSCRIBE_FACTOR = 0.1
+SUMMARIZE_SECONDS = 10.0
+
+# Anything this long counts as a "long upload" in the per-class breakdown
+LONG_JOB_SECONDS = 600
+
+
+def make_workload(long_jobs: int, short_jobs: int, clients: int, seed: int):
+    """Returns (arrival_s, client_id, duration_s) tuples sorted by arrival."""
+    rng = random.Random(seed)
+    jobs = [(rng.uniform(0, 5), "heavy", rng.uniform(3600, 5400)) for _ in range(long_jobs)]
+    jobs += [
+        (rng.uniform(0, 120), f"client-{rng.randrange(clients)}", rng.uniform(15, 60))
+        for _ in range(short_jobs)
+    ]
+    return sorted(jobs)
+
+
+def run(workload, fair: bool, scale: float, per_client_limit: int, aging: float):
+    """Runs the workload and returns (completion_s, is_long) per job, in simulated seconds."""
+    origin = time.monotonic()
+    clock = lambda: (time.monotonic() - origin) / scale
+    scheduler = Scheduler(
+        STAGE_LIMITS,
+        per_client_limit=per_client_limit if fair else len(workload),
+        aging=aging,
+        clock=clock,
+    )
+    completion = []
+    lock = threading.Lock()
+
+    def pipeline(client_id, duration):
+        # FIFO baseline: with zero cost every job is ordered by submit time alone
+        job = scheduler.new_job(client_id, duration if fair else 0.0)
+        with scheduler.stage("convert", job):
+            time.sleep(duration * CONVERT_FACTOR * scale)
+        with scheduler.stage("transcribe", job):
+            time.sleep(duration * TRANSCRIBE_FACTOR * scale)
+        with scheduler.stage("summarize", job):
+            time.sleep(SUMMARIZE_SECONDS * scale)
+        scheduler.finish(job)
+        with lock:
+            completion.append((job.completed_at - job.submitted_at, duration >= LONG_JOB_SECONDS))
+
+    threads = []
+    for arrival, client_id, duration in workload:
+        delay = arrival - clock()
+        if delay > 0:
+            time.sleep(delay * scale)
+        thread = threading.Thread(target=pipeline, args=(client_id, duration))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return completion
+
+
+def percentiles(times):
+    times = sorted(times)
+    mean = sum(times) / len(times)
+    p95 = times[min(len(times) - 1, int(round(0.95 * (len(times) - 1))))]
+    return mean, p95, times[-1]
+
+
+def summarize(label: str, completion):
+    mean, p95, worst = percentiles([t for t, _ in completion])
+    print(f"{label:<6} all   mean {mean:7.0f} s   p95 {p95:7.0f} s   max {worst:7.0f} s")
+    for name, is_long in (("short", False), ("long", True)):
+        times = [t for t, job_is_long in completion if job_is_long == is_long]
+        if times:
+            c_mean, c_p95, c_worst = percentiles(times)
+            print(f"{'':<6} {name:<5} mean {c_mean:7.0f} s   p95 {c_p95:7.0f} s   max {c_worst:7.0f} s")
+    return mean, p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--long-jobs", type=int, default=2)
+    parser.add_argument("--short-jobs", type=int, default=60)
+    parser.add_argument("--clients", type=int, default=5, help="clients sending short clips")
+    parser.add_argument("--per-client-limit", type=int, default=2)
+    parser.add_argument("--aging", type=float, default=5.0)
+    parser.add_argument("--scale", type=float, default=0.0005, help="real seconds per simulated second")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    workload = make_workload(args.long_jobs, args.short_jobs, args.clients, args.seed)
+    print(f"{args.long_jobs} long uploads + {args.short_jobs} short clips, completion times in simulated seconds")
+
+    fifo_mean, fifo_p95 = summarize("fifo", run(workload, False, args.scale, args.per_client_limit, args.aging))
+    fair_mean, fair_p95 = summarize("fair", run(workload, True, args.scale, args.per_client_limit, args.aging))
+    print(f"mean {fifo_mean / fair_mean:.1f}x faster, p95 {fifo_p95 / fair_p95:.1f}x faster")
+
+    return 0 if fair_mean < fifo_mean and fair_p95 < fifo_p95 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Latency benchmark for the transcript search index.
+
+Builds a synthetic index (or reuses one with --path) and times /search
+queries at several page offsets. Words follow a Zipf-like distribution, so
+the default queries run from rare (w4000) to terms found in almost every
+transcript (w17, the). BM25 has to score every match, so the common terms
+are far slower than the selective ones.
+
+    python bench_search.py                                   # 100k transcripts, 800 words each
+    python bench_search.py --path /tmp/bench.db              # reuse the index from an earlier run
+    python bench_search.py --path /tmp/bench.db --syntax fts5 --queries '"w3 w4"'
+    python bench_search.py --path /tmp/bench.db --queries w4000 w1234 --max-ms 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from search_index import SearchIndex
+
+VOCABULARY = [f"w{i}" for i in range(5000)]
+# Zipf-like weights, so a few words are common and most are rare
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+def build(index: SearchIndex, docs: int, words: int, seed: int):
+    rng = random.Random(seed)
+    conn = index.connect()
+    batch = []
+    for i in range(docs):
+        transcript = " ".join(rng.choices(VOCABULARY, WEIGHTS, k=words)) + " the"
+        batch.append((f"video-{i}.mp4", transcript, "summary of the video", 0.0))
+        if len(batch) == 5000 or i == docs - 1:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO documents (filename, transcript, summary, updated_at) VALUES (?, ?, ?, ?)", batch
+                )
+            batch = []
+    with conn:
+        conn.execute("INSERT INTO documents_fts(documents_fts) VALUES ('optimize')")
+
+
+def time_query(index: SearchIndex, query: str, limit: int, offset: int, repeats: int, raw: bool) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        index.search(query, limit + 1, offset, raw=raw)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--words", type=int, default=800, help="words per transcript")
+    parser.add_argument("--path", help="index file to build or reuse (default: a temporary file)")
+    parser.add_argument("--queries", nargs="+", default=["w4000", "w1234", "w1234 w99", "w17", "w3 w4", "the"])
+    parser.add_argument("--syntax", choices=["plain", "fts5"], default="plain",
+                        help="query syntax, as in /search (fts5 allows phrases like '\"w3 w4\"')")
+    parser.add_argument("--offsets", nargs="+", type=int, default=[0, 100, 5000])
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, help="fail if any query exceeds this many ms")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    path = args.path or os.path.join(tempfile.mkdtemp(), "bench_search.db")
+    index = SearchIndex(path)
+    existing = index.connect().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    if not existing:
+        start = time.perf_counter()
+        build(index, args.docs, args.words, args.seed)
+        print(f"built {args.docs} transcripts x {args.words} words in {time.perf_counter() - start:.1f} s ({path})")
+    else:
+        print(f"reusing {existing} transcripts from {path}")
+
+    worst = 0.0
+    print(f"{'query':<14}" + "".join(f"{f'offset {o}':>14}" for o in args.offsets))
+    for query in args.queries:
+        timings = [time_query(index, query, args.limit, offset, args.repeats, args.syntax == "fts5") for offset in args.offsets]
+        print(f"{query:<14}" + "".join(f"{t:>11.1f} ms" for t in timings))
+        worst = max(worst, *timings)
+
+    if args.max_ms is not None and worst > args.max_ms:
+        print(f"[Error] Slowest query took {worst:.1f} ms, over the {args.max_ms:.0f} ms budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
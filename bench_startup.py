@@ -0,0 +1,88 @@
+"""Cold-start benchmark for the serverless entry point.
+
+Every run imports the app in a fresh interpreter, the same way a Vercel cold
+start does, and reports how long the import took.
+
+    python bench_startup.py                  # median/p95 import time over 10 cold starts
+    python bench_startup.py --max-ms 400     # exit 1 if the median goes over budget
+    python bench_startup.py --profile        # import time per module (python -X importtime)
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+TIMER_SNIPPET = (
+    "import time; start = time.perf_counter(); "
+    "import {module}; "
+    "print((time.perf_counter() - start) * 1000)"
+)
+
+
+def run_python(args, env: dict) -> subprocess.CompletedProcess:
+    """Runs a fresh interpreter; if it fails, shows the child's own error output and exits."""
+    result = subprocess.run([sys.executable, *args], env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        # Drop -X importtime noise so the actual traceback is readable
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        print("\n".join(errors), file=sys.stderr)
+        raise SystemExit(f"[Error] Cold start failed with exit code {result.returncode}, see the output above")
+    return result
+
+
+def cold_start_ms(module: str, env: dict) -> float:
+    """Imports the module in a brand-new interpreter and returns the import time in ms."""
+    output = run_python(["-c", TIMER_SNIPPET.format(module=module)], env).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def import_profile(module: str, env: dict):
+    """Returns (cumulative_us, self_us, name) for each module imported by `module`."""
+    stderr = run_python(["-X", "importtime", "-c", f"import {module}"], env).stderr
+
+    rows = []
+    for line in stderr.splitlines():
+        # Format: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="videototext", help="module to import (default: videototext)")
+    parser.add_argument("--runs", type=int, default=10, help="number of cold starts to time")
+    parser.add_argument("--max-ms", type=float, help="fail if the median cold start exceeds this many ms")
+    parser.add_argument("--profile", action="store_true", help="print import time per module instead")
+    parser.add_argument("--top", type=int, default=25, help="modules to show with --profile")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # Lifespan prewarming never runs on a bare import, but keep the run hermetic anyway
+    env["PREWARM_CLIENTS"] = "0"
+
+    if args.profile:
+        rows = import_profile(args.module, env)
+        total_us = max(row[0] for row in rows)
+        print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for cumulative_us, self_us, name in sorted(rows, reverse=True)[:args.top]:
+            print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
+        print(f"\nTotal import time: {total_us / 1000:.1f} ms across {len(rows)} modules")
+        return 0
+
+    timings = sorted(cold_start_ms(args.module, env) for _ in range(args.runs))
+    median = statistics.median(timings)
+    p95 = timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))]
+    print(f"cold start ({args.runs} runs): min {timings[0]:.1f} ms, median {median:.1f} ms, p95 {p95:.1f} ms")
+
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"[Error] Median cold start {median:.1f} ms is over the {args.max_ms:.0f} ms budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2 @@
+# Lets the tests in tests/ import the top-level modules (scheduler, search_index)
+# when run as plain `pytest`, not only as `python -m pytest`.
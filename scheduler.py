@@ -0,0 +1,205 @@
+import itertools
+import struct
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Used when the MP4 header can't be read: ~1 Mbit/s, i.e. about 8 seconds of video per MB
+FALLBACK_SECONDS_PER_MB = 8.0
+
+# A probed duration is only trusted within this factor of the size-based estimate
+# (roughly 60 kbit/s to 16 Mbit/s); anything outside is clamped to that range.
+MAX_DURATION_TO_SIZE_RATIO = 16.0
+
+# mvhd durations that mean "unknown" rather than a real length
+UNKNOWN_DURATIONS = (0, 0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF)
+
+
+def probe_mp4_duration(file_bytes: bytes) -> Optional[float]:
+    """Reads the duration in seconds from the MP4 `moov/mvhd` box, or None if it can't be found."""
+    moov = _find_box(file_bytes, 0, len(file_bytes), b"moov")
+    if moov is None:
+        return None
+    mvhd = _find_box(file_bytes, moov[0], moov[1], b"mvhd")
+    if mvhd is None:
+        return None
+
+    start, end = mvhd
+    try:
+        version = file_bytes[start]
+        if version == 1:
+            timescale, duration = struct.unpack_from(">IQ", file_bytes, start + 20)
+        else:
+            timescale, duration = struct.unpack_from(">II", file_bytes, start + 12)
+    except (IndexError, struct.error):
+        return None
+
+    # Fragmented MP4s often leave the duration at 0 or all ones
+    if not timescale or duration in UNKNOWN_DURATIONS:
+        return None
+    return duration / timescale
+
+
+def _find_box(data: bytes, start: int, end: int, box_type: bytes):
+    """Returns the (payload_start, payload_end) of the first child box of the given type."""
+    pos = start
+    while pos + 8 <= end:
+        size, current_type = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return None
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return None
+        if current_type == box_type:
+            return pos + header, min(pos + size, end)
+        pos += size
+    return None
+
+
+def resolve_client_id(peer_host: Optional[str], headers, trusted_proxy_header: Optional[str] = None) -> str:
+    """Picks the address fair share is keyed on.
+
+    Behind Vercel or another reverse proxy every request comes from the proxy,
+    so the real client is read from the header that proxy sets. Only the last
+    entry is used: earlier ones in e.g. X-Forwarded-For are whatever the client
+    sent and can be spoofed. Without a trusted header the peer address is used.
+    """
+    if trusted_proxy_header:
+        forwarded = headers.get(trusted_proxy_header.lower())
+        if forwarded:
+            client = forwarded.split(",")[-1].strip()
+            if client:
+                return client
+    return peer_host or "anonymous"
+
+
+def estimate_job_cost(file_bytes: bytes) -> float:
+    """Estimates how many seconds of media a job holds, from the MP4 header or else the file size.
+
+    The header can't be trusted blindly: a tiny duration would jump a huge
+    file to the front of the queue, so it is clamped around the size estimate.
+    """
+    size_estimate = len(file_bytes) / (1024 * 1024) * FALLBACK_SECONDS_PER_MB
+    duration = probe_mp4_duration(file_bytes)
+    if duration is None:
+        return size_estimate
+    return min(max(duration, size_estimate / MAX_DURATION_TO_SIZE_RATIO), size_estimate * MAX_DURATION_TO_SIZE_RATIO)
+
+
+class Job:
+    """One queued video, ordered by estimated cost and aged by how long it has waited."""
+
+    def __init__(self, job_id: int, client_id: str, cost: float, submitted_at: float, aging: float):
+        self.job_id = job_id
+        self.client_id = client_id
+        self.cost = cost
+        self.submitted_at = submitted_at
+        self.completed_at: Optional[float] = None
+        # Priority is cost - aging * waited. Every job ages at the same rate, so the
+        # ordering never changes and the key can be computed once at submit time.
+        self.priority = cost + aging * submitted_at
+
+
+class StageGate:
+    """Caps concurrency for one pipeline stage and hands out free slots shortest-job-first.
+
+    A job is only eligible if its client holds fewer than `per_client_limit` slots
+    in this stage, so one client's backlog can't take every slot.
+    """
+
+    def __init__(self, name: str, limit: int, per_client_limit: int):
+        self.name = name
+        self.limit = limit
+        self.per_client_limit = per_client_limit
+        self.cond = threading.Condition()
+        self.waiting = []
+        self.running = 0
+        self.running_by_client = Counter()
+        self.seq = itertools.count()
+
+    def _next_eligible(self):
+        eligible = [
+            entry for entry in self.waiting
+            if self.running_by_client[entry[2].client_id] < self.per_client_limit
+        ]
+        return min(eligible) if eligible else None
+
+    def acquire(self, job: Job):
+        with self.cond:
+            entry = (job.priority, next(self.seq), job)
+            self.waiting.append(entry)
+            while self.running >= self.limit or self._next_eligible() is not entry:
+                self.cond.wait()
+            self.waiting.remove(entry)
+            self.running += 1
+            self.running_by_client[job.client_id] += 1
+            # The next-best waiter may fit in a slot that is still free
+            self.cond.notify_all()
+
+    def release(self, job: Job):
+        with self.cond:
+            self.running -= 1
+            self.running_by_client[job.client_id] -= 1
+            if not self.running_by_client[job.client_id]:
+                del self.running_by_client[job.client_id]
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            return {"limit": self.limit, "running": self.running, "waiting": len(self.waiting)}
+
+
+class Scheduler:
+    """Size-aware fair scheduler for the video pipeline.
+
+    Each stage has its own concurrency cap. Wrap the work for a stage in
+    `with scheduler.stage(name, job):` to wait for a slot in that stage.
+    """
+
+    def __init__(self, stage_limits: Dict[str, int], per_client_limit: int = 2, aging: float = 5.0,
+                 clock=time.monotonic, history_size: int = 1000):
+        self.clock = clock
+        self.aging = aging
+        self.gates = {name: StageGate(name, limit, per_client_limit) for name, limit in stage_limits.items()}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.completion_times = deque(maxlen=history_size)
+        self.failed = 0
+
+    def new_job(self, client_id: str, cost: float) -> Job:
+        return Job(next(self.ids), client_id, cost, self.clock(), self.aging)
+
+    @contextmanager
+    def stage(self, name: str, job: Job):
+        gate = self.gates[name]
+        gate.acquire(job)
+        try:
+            yield
+        finally:
+            gate.release(job)
+
+    def finish(self, job: Job, succeeded: bool = True):
+        """Marks a job done. Only successful jobs count towards the completion-time stats."""
+        job.completed_at = self.clock()
+        with self.lock:
+            if succeeded:
+                self.completion_times.append(job.completed_at - job.submitted_at)
+            else:
+                self.failed += 1
+
+    def stats(self):
+        with self.lock:
+            times = sorted(self.completion_times)
+            failed = self.failed
+        summary = {"completed": len(times), "failed": failed}
+        if times:
+            summary["mean_seconds"] = sum(times) / len(times)
+            summary["p95_seconds"] = times[min(len(times) - 1, int(round(0.95 * (len(times) - 1))))]
+        return {"stages": {name: gate.stats() for name, gate in self.gates.items()}, "jobs": summary}
@@ -0,0 +1,136 @@
+import sqlite3
+import threading
+import time
+
+# MATCH parse errors. Anything else (locked, read-only, disk I/O) is a server problem.
+QUERY_ERROR_PREFIXES = ("fts5:", "unterminated string", "no such column", "unknown special query")
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS documents (
+        id INTEGER PRIMARY KEY,
+        filename TEXT NOT NULL UNIQUE,
+        transcript TEXT NOT NULL DEFAULT '',
+        summary TEXT NOT NULL DEFAULT '',
+        updated_at REAL NOT NULL
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+        transcript, summary,
+        content='documents', content_rowid='id',
+        tokenize='porter unicode61'
+    );
+    CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+        INSERT INTO documents_fts(rowid, transcript, summary) VALUES (new.id, new.transcript, new.summary);
+    END;
+    CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+        INSERT INTO documents_fts(documents_fts, rowid, transcript, summary) VALUES ('delete', old.id, old.transcript, old.summary);
+    END;
+    CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN
+        INSERT INTO documents_fts(documents_fts, rowid, transcript, summary) VALUES ('delete', old.id, old.transcript, old.summary);
+        INSERT INTO documents_fts(rowid, transcript, summary) VALUES (new.id, new.transcript, new.summary);
+    END;
+"""
+
+UPSERT = """
+    INSERT INTO documents (filename, transcript, summary, updated_at)
+    VALUES (?, COALESCE(?, ''), COALESCE(?, ''), ?)
+    ON CONFLICT(filename) DO UPDATE SET
+        transcript = COALESCE(?, transcript),
+        summary = COALESCE(?, summary),
+        updated_at = excluded.updated_at
+"""
+
+# The page is ranked and cut down to `limit` rowids first, and materialized so
+# the planner can't fold it back in. CROSS JOIN keeps the page as the outer
+# loop, so snippet() re-matches only those rows by rowid instead of running
+# the full-text match a second time over every hit.
+SEARCH = """
+    WITH page AS MATERIALIZED (
+        SELECT rowid AS id, rank AS score
+        FROM documents_fts
+        WHERE documents_fts MATCH ?
+        ORDER BY rank
+        LIMIT ? OFFSET ?
+    )
+    SELECT d.filename,
+           snippet(documents_fts, 0, '<b>', '</b>', '...', 16) AS transcript_snippet,
+           snippet(documents_fts, 1, '<b>', '</b>', '...', 16) AS summary_snippet,
+           page.score
+    FROM page
+    CROSS JOIN documents_fts ON documents_fts.rowid = page.id AND documents_fts MATCH ?
+    JOIN documents d ON d.id = page.id
+    ORDER BY page.score
+"""
+
+
+def to_match_query(text: str) -> str:
+    """Turns free text into an FTS5 query that matches every word, with no operators.
+
+    Each word becomes a quoted FTS5 string, so apostrophes, hyphens, dots and
+    words like AND/NOT are searched for literally instead of parsed as syntax.
+    """
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+def is_query_error(error: sqlite3.OperationalError) -> bool:
+    """True when SQLite rejected the user's MATCH expression, not the database itself."""
+    return str(error).startswith(QUERY_ERROR_PREFIXES)
+
+
+class SearchIndex:
+    """SQLite FTS5 index over transcripts and summaries, ranked with BM25.
+
+    Writes go through one connection behind a lock. Searches use one reader
+    connection per thread, so in WAL mode they never wait on writes or on
+    each other.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.write_lock = threading.Lock()
+        self.writer = None
+        self.readers = threading.local()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def connect(self):
+        """Opens the writer connection on first use and creates the schema if needed."""
+        if self.writer is not None:
+            return self.writer
+        with self.write_lock:
+            if self.writer is None:
+                conn = self._connect()
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(SCHEMA)
+                self.writer = conn
+            return self.writer
+
+    def _reader(self):
+        conn = getattr(self.readers, "conn", None)
+        if conn is None:
+            # Make sure the schema exists before the first read
+            self.connect()
+            conn = self._connect()
+            self.readers.conn = conn
+        return conn
+
+    def upsert(self, filename: str, transcript: str = None, summary: str = None):
+        """Adds or updates one video; a None field keeps whatever is already stored."""
+        conn = self.connect()
+        with self.write_lock, conn:
+            conn.execute(UPSERT, (filename, transcript, summary, time.time(), transcript, summary))
+
+    def search(self, query: str, limit: int = 10, offset: int = 0, raw: bool = False):
+        """Runs a BM25-ranked full-text query and returns matches with highlighted snippets.
+
+        `query` is plain text unless `raw` is set, in which case it is passed to
+        FTS5 as-is and may use its operators (AND/OR/NOT, prefix*, column filters).
+        """
+        match = query if raw else to_match_query(query)
+        if not match.strip():
+            return []
+        rows = self._reader().execute(SEARCH, (match, limit, offset, match)).fetchall()
+        return [dict(row) for row in rows]
@@ -0,0 +1,174 @@
+import struct
+import threading
+import time
+
+import pytest
+
+from scheduler import Scheduler, StageGate, estimate_job_cost, probe_mp4_duration, resolve_client_id
+
+MB = 1024 * 1024
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def mp4(timescale: int, duration: int, version: int = 0, padding: int = 0) -> bytes:
+    if version == 1:
+        fields = struct.pack(">QQIQ", 0, 0, timescale, duration)
+    else:
+        fields = struct.pack(">IIII", 0, 0, timescale, duration)
+    mvhd = box(b"mvhd", bytes([version, 0, 0, 0]) + fields + bytes(80))
+    return box(b"ftyp", b"isom" * 4) + box(b"mdat", bytes(padding)) + box(b"moov", mvhd)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def start_acquire(gate, job, granted):
+    def run():
+        gate.acquire(job)
+        granted.append(job.job_id)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_probe_mvhd_v0_and_v1():
+    assert probe_mp4_duration(mp4(1000, 20500)) == 20.5
+    assert probe_mp4_duration(mp4(600, 600 * 5400, version=1)) == 5400.0
+    assert probe_mp4_duration(b"not an mp4") is None
+
+
+@pytest.mark.parametrize("duration, version", [(0, 0), (0xFFFFFFFF, 0), (0xFFFFFFFFFFFFFFFF, 1)])
+def test_unknown_duration_falls_back_to_size(duration, version):
+    file_bytes = mp4(1000, duration, version=version, padding=20 * MB)
+    assert probe_mp4_duration(file_bytes) is None
+    assert estimate_job_cost(file_bytes) == pytest.approx(len(file_bytes) / MB * 8)
+
+
+def test_implausible_duration_is_clamped_to_size():
+    # 20 MB claiming to be one second long must not jump the queue
+    assert estimate_job_cost(mp4(1000, 1000, padding=20 * MB)) > 9
+    assert estimate_job_cost(mp4(1, 10 ** 9, padding=MB)) < 200
+    # A plausible header wins over the size guess
+    assert estimate_job_cost(mp4(1000, 30_000, padding=2 * MB)) == 30.0
+
+
+def test_shortest_job_gets_the_free_slot_first():
+    clock = FakeClock()
+    scheduler = Scheduler({"convert": 1}, per_client_limit=5, aging=0, clock=clock)
+    gate = scheduler.gates["convert"]
+    holder = scheduler.new_job("a", 1)
+    gate.acquire(holder)
+
+    granted = []
+    long_job, short_job = scheduler.new_job("b", 500), scheduler.new_job("c", 20)
+    threads = [start_acquire(gate, long_job, granted), start_acquire(gate, short_job, granted)]
+    wait_until(lambda: gate.stats()["waiting"] == 2)
+
+    gate.release(holder)
+    wait_until(lambda: len(granted) == 1)
+    assert granted == [short_job.job_id]
+    gate.release(short_job)
+    wait_until(lambda: len(granted) == 2)
+    assert granted == [short_job.job_id, long_job.job_id]
+    for thread in threads:
+        thread.join(timeout=5)
+
+
+def test_aging_lets_an_old_long_job_go_first():
+    clock = FakeClock()
+    scheduler = Scheduler({"convert": 1}, per_client_limit=5, aging=5, clock=clock)
+    gate = scheduler.gates["convert"]
+    holder = scheduler.new_job("a", 1)
+    gate.acquire(holder)
+
+    granted = []
+    old_long = scheduler.new_job("b", 100)
+    threads = [start_acquire(gate, old_long, granted)]
+    wait_until(lambda: gate.stats()["waiting"] == 1)
+
+    # 50 seconds later a short clip arrives: 100 - 5 * 50 waited beats a fresh 10
+    clock.now = 50
+    new_short = scheduler.new_job("c", 10)
+    threads.append(start_acquire(gate, new_short, granted))
+    wait_until(lambda: gate.stats()["waiting"] == 2)
+
+    gate.release(holder)
+    wait_until(lambda: len(granted) == 1)
+    assert granted == [old_long.job_id]
+    gate.release(old_long)
+    wait_until(lambda: len(granted) == 2)
+    assert granted == [old_long.job_id, new_short.job_id]
+    for thread in threads:
+        thread.join(timeout=5)
+
+
+def test_per_client_cap_leaves_slots_for_other_clients():
+    gate = StageGate("convert", limit=3, per_client_limit=1)
+    scheduler = Scheduler({}, clock=FakeClock())
+    first = scheduler.new_job("greedy", 1)
+    gate.acquire(first)
+
+    granted = []
+    second = scheduler.new_job("greedy", 1)
+    thread = start_acquire(gate, second, granted)
+    wait_until(lambda: gate.stats()["waiting"] == 1)
+
+    # Slots are free, but the greedy client is at its cap; another client gets straight in
+    other = scheduler.new_job("other", 100)
+    gate.acquire(other)
+    assert granted == [] and gate.stats()["running"] == 2
+
+    gate.release(first)
+    thread.join(timeout=5)
+    assert granted == [second.job_id]
+
+
+def test_forwarded_clients_get_separate_limits():
+    proxy = "10.0.0.1"
+    alice = resolve_client_id(proxy, {"x-forwarded-for": "198.51.100.7"}, "X-Forwarded-For")
+    bob = resolve_client_id(proxy, {"x-forwarded-for": "6.6.6.6, 203.0.113.9"}, "X-Forwarded-For")
+    assert (alice, bob) == ("198.51.100.7", "203.0.113.9")
+
+    gate = StageGate("convert", limit=4, per_client_limit=1)
+    scheduler = Scheduler({}, clock=FakeClock())
+    gate.acquire(scheduler.new_job(alice, 1))
+    # Would block forever if both uploads were keyed on the proxy address
+    gate.acquire(scheduler.new_job(bob, 1))
+    assert gate.stats()["running"] == 2
+
+
+def test_client_id_ignores_forwarded_headers_unless_trusted():
+    headers = {"x-forwarded-for": "198.51.100.7"}
+    assert resolve_client_id("10.0.0.1", headers) == "10.0.0.1"
+    assert resolve_client_id("10.0.0.1", {}, "x-real-ip") == "10.0.0.1"
+    assert resolve_client_id(None, {}) == "anonymous"
+
+
+def test_failed_jobs_are_kept_out_of_completion_stats():
+    clock = FakeClock()
+    scheduler = Scheduler({"convert": 1}, clock=clock)
+    ok, failed = scheduler.new_job("a", 1), scheduler.new_job("b", 1)
+    clock.now = 10
+    scheduler.finish(ok)
+    clock.now = 1000
+    scheduler.finish(failed, succeeded=False)
+
+    jobs = scheduler.stats()["jobs"]
+    assert jobs["completed"] == 1 and jobs["failed"] == 1
+    assert jobs["mean_seconds"] == jobs["p95_seconds"] == 10
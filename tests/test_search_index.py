@@ -0,0 +1,82 @@
+import sqlite3
+import threading
+
+import pytest
+
+from search_index import SearchIndex, is_query_error
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SearchIndex(str(tmp_path / "index.db"))
+
+
+def test_upsert_keeps_existing_fields(index):
+    index.upsert("a.mp4", transcript="rockets launch at dawn")
+    index.upsert("a.mp4", summary="a video about rockets")
+
+    hits = index.search("dawn")
+    assert [hit["filename"] for hit in hits] == ["a.mp4"]
+    assert "<b>dawn</b>" in hits[0]["transcript_snippet"]
+    assert index.search("video")[0]["summary_snippet"] == "a <b>video</b> about rockets"
+
+
+def test_pages_follow_rank_order(index):
+    for i in range(30):
+        index.upsert(f"{i}.mp4", transcript="ocean " * (i + 1) + "filler " * 50)
+
+    everything = [hit["filename"] for hit in index.search("ocean", limit=30)]
+    pages = [hit["filename"] for offset in range(0, 30, 7) for hit in index.search("ocean", limit=7, offset=offset)]
+    assert pages == everything
+    assert everything[0] == "29.mp4"
+
+
+def test_search_does_not_wait_on_writer_lock(index):
+    index.upsert("a.mp4", transcript="hello there")
+    found = []
+    with index.write_lock:
+        thread = threading.Thread(target=lambda: found.extend(index.search("hello")))
+        thread.start()
+        thread.join(timeout=5)
+    assert [hit["filename"] for hit in found] == ["a.mp4"]
+
+
+@pytest.mark.parametrize("query", ["don't", "what's new?", "covid-19", "e-mail", "U.S.", "3.5", "-rocket"])
+def test_plain_text_queries_with_punctuation_find_hits(index, query):
+    index.upsert(
+        "a.mp4",
+        transcript="Don't miss what's new: covid-19 rules, an e-mail from the U.S. office and rocket 3.5.",
+    )
+    assert [hit["filename"] for hit in index.search(query)] == ["a.mp4"]
+
+
+@pytest.mark.parametrize("query, found", [
+    ('say "hi', False), ("AND", False), ("?", False), ("   ", False),
+    ("(rocket", True), ("nosuchcolumn:rocket", False), ("rocket*", True),
+])
+def test_plain_text_never_raises_on_fts5_syntax(index, query, found):
+    index.upsert("a.mp4", transcript="rocket")
+    assert bool(index.search(query)) == found
+
+
+def test_raw_fts5_syntax_is_opt_in(index):
+    index.upsert("a.mp4", transcript="rocket launch")
+    index.upsert("b.mp4", transcript="rocket landing")
+    assert index.search("rocket NOT launch") == []
+    assert [hit["filename"] for hit in index.search("rocket NOT launch", raw=True)] == ["b.mp4"]
+    assert len(index.search("launch*", raw=True)) == 1
+
+
+@pytest.mark.parametrize("query", ['"unterminated', "AND", "(rocket", "nosuchcolumn:rocket"])
+def test_malformed_raw_queries_are_query_errors(index, query):
+    index.upsert("a.mp4", transcript="rocket")
+    with pytest.raises(sqlite3.OperationalError) as excinfo:
+        index.search(query, raw=True)
+    assert is_query_error(excinfo.value)
+
+
+def test_database_failures_are_not_query_errors(tmp_path):
+    index = SearchIndex(str(tmp_path / "missing" / "index.db"))
+    with pytest.raises(sqlite3.OperationalError) as excinfo:
+        index.search("rocket")
+    assert not is_query_error(excinfo.value)
@@ -0,0 +1,39 @@
+import os
+import statistics
+
+import pytest
+
+from bench_startup import cold_start_ms, run_python
+
+# Median cold import of the app must stay under this; override per machine/CI runner
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+
+
+@pytest.fixture
+def env():
+    env = dict(os.environ)
+    env["PREWARM_CLIENTS"] = "0"
+    return env
+
+
+def test_cold_start_stays_within_budget(env):
+    pytest.importorskip("fastapi")
+    median = statistics.median(cold_start_ms("videototext", env) for _ in range(3))
+    assert median <= STARTUP_BUDGET_MS, f"cold start took {median:.0f} ms, budget is {STARTUP_BUDGET_MS:.0f} ms"
+
+
+def test_heavy_clients_are_not_imported_at_startup(env):
+    pytest.importorskip("fastapi")
+    output = run_python(["-c", "import sys, videototext; print('requests' in sys.modules)"], env).stdout
+    assert output.strip().splitlines()[-1] == "False"
+
+
+def test_cold_start_measures_a_fresh_interpreter(env):
+    assert cold_start_ms("json", env) > 0
+
+
+def test_failed_import_exits_with_the_child_error(env, capsys):
+    with pytest.raises(SystemExit) as excinfo:
+        cold_start_ms("no_such_module_for_bench", env)
+    assert "Cold start failed" in str(excinfo.value)
+    assert "No module named 'no_such_module_for_bench'" in capsys.readouterr().err
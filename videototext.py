@@ -1,16 +1,22 @@
 import os
 import time
-import requests
+import sqlite3
 import threading
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request
 from fastapi.responses import JSONResponse
-from dotenv import load_dotenv
-from typing import Dict, List
+from typing import Dict, List, Optional
 import io
 
+from scheduler import Job, Scheduler, estimate_job_cost, resolve_client_id
+from search_index import SearchIndex, is_query_error
+
+from dotenv import load_dotenv
+
+# Always load .env: it holds the upstream URLs and tuning settings as well as
+# the keys. Variables already set in the environment still take precedence.
 load_dotenv()
 
-app = FastAPI()
 logs: List[str] = []
 results: Dict[str, Dict] = {} 
 
@@ -18,6 +24,76 @@ CLOUDCONVERT_API_KEY = os.getenv("CLOUDCONVERT_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 CLOUDCONVERT_URL = os.getenv("CLOUDCONVERT_URL")
 OPENAI_URL = os.getenv("OPENAI_URL")
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "transcripts.db")
+
+PREWARM_CLIENTS = os.getenv("PREWARM_CLIENTS", "1") == "1"
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+# Header the fronting proxy sets to the real client address, e.g. x-real-ip on Vercel
+TRUSTED_PROXY_HEADER = os.getenv("TRUSTED_PROXY_HEADER")
+
+search_index = SearchIndex(SEARCH_INDEX_PATH)
+
+scheduler = Scheduler(
+    stage_limits={
+        "convert": int(os.getenv("SCHEDULER_CONVERT_LIMIT", "4")),
+        "transcribe": int(os.getenv("SCHEDULER_TRANSCRIBE_LIMIT", "4")),
+        "summarize": int(os.getenv("SCHEDULER_SUMMARIZE_LIMIT", "8")),
+    },
+    per_client_limit=int(os.getenv("SCHEDULER_PER_CLIENT_LIMIT", "2")),
+    aging=float(os.getenv("SCHEDULER_AGING", "5")),
+)
+
+http_session_lock = threading.Lock()
+http_session = None
+
+def get_http_session():
+    """Creates the shared requests session on first use so cold starts don't import requests."""
+    global http_session
+    if http_session is None:
+        with http_session_lock:
+            if http_session is None:
+                import requests
+                from http.cookiejar import DefaultCookiePolicy
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                # The session is shared by every user's pipeline thread, so never
+                # let a cookie set on one user's request leak onto another's
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                http_session = session
+    return http_session
+
+def prewarm_clients():
+    """Builds the HTTP session and search index, then opens pooled connections to the upstream APIs."""
+    start = time.perf_counter()
+    session = get_http_session()
+    try:
+        search_index.connect()
+    except sqlite3.Error as e:
+        print(f"[Prewarm] Search index unavailable: {str(e)}")
+
+    for base_url in (CLOUDCONVERT_URL, OPENAI_URL):
+        if not base_url:
+            continue
+        try:
+            # Any response is fine, we only want the TLS connection sitting in the pool
+            session.head(base_url, timeout=5)
+        except Exception as e:
+            print(f"[Prewarm] Could not reach {base_url}: {str(e)}")
+
+    print(f"[Prewarm] Clients ready in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if PREWARM_CLIENTS:
+        # Warm up in the background so the first request isn't held behind it
+        threading.Thread(target=prewarm_clients, daemon=True).start()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 async def read_root():
@@ -29,7 +105,7 @@ async def get_current_step():
     return {"logs": logs} if logs else {"message": "No steps started yet"}
 
 @app.post("/process_video/")
-async def process_video(file: UploadFile = File(...)):
+async def process_video(request: Request, file: UploadFile = File(...)):
     logs.clear()
     logs.append("[Step 0/9] Starting process_video...")
     print("[Step 0/9] Starting process_video...")
@@ -42,67 +118,92 @@ async def process_video(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Only MP4 files are allowed")
 
     file_bytes = await file.read()
-    thread = threading.Thread(target=process_video_task, args=(file_bytes, file.filename))
+    # Fair share is keyed on the caller's address; a self-declared id header
+    # would let one uploader dodge the per-client limit by rotating ids
+    client_id = resolve_client_id(
+        request.client.host if request.client else None, request.headers, TRUSTED_PROXY_HEADER
+    )
+    job = scheduler.new_job(client_id, estimate_job_cost(file_bytes))
+    logs.append(f"[Step 0/9] Queued job {job.job_id} (~{job.cost:.0f}s of video)")
+    print(f"[Step 0/9] Queued job {job.job_id} (~{job.cost:.0f}s of video)")
+
+    thread = threading.Thread(target=process_video_task, args=(file_bytes, file.filename, job))
     thread.start()
 
-    return JSONResponse(content={"message": "Processing started, check /current_step"})
-
-def process_video_task(file_bytes: bytes, filename: str):
-    """Runs the video processing logic in a separate thread."""
+    return JSONResponse(content={
+        "message": "Processing started, check /current_step",
+        "job_id": job.job_id,
+        "estimated_seconds": round(job.cost, 1),
+    })
+
+@app.get("/scheduler")
+async def get_scheduler_stats():
+    return scheduler.stats()
+
+def process_video_task(file_bytes: bytes, filename: str, job: Optional[Job] = None):
+    """Runs the video processing logic in a separate thread.
+
+    Each pipeline stage waits for a slot from the scheduler, so short videos
+    get ahead of long ones and one client can't fill every slot.
+    """
+    if job is None:
+        job = scheduler.new_job("local", estimate_job_cost(file_bytes))
+    succeeded = False
     try:
-        logs.append("[Step 1/9] Uploading to CloudConvert...")
-        print("[Step 1/9] Uploading to CloudConvert...")
+        with scheduler.stage("convert", job):
+            logs.append("[Step 1/9] Uploading to CloudConvert...")
+            print("[Step 1/9] Uploading to CloudConvert...")
 
-        file_id = upload_to_cloudconvert(file_bytes, filename)
-        print("file_id", file_id)
+            file_id = upload_to_cloudconvert(file_bytes, filename)
+            print("file_id", file_id)
 
-        logs.append("[Step 2/9] Starting conversion to MP3...")
-        print("[Step 2/9] Starting conversion to MP3...")
+            logs.append("[Step 2/9] Starting conversion to MP3...")
+            print("[Step 2/9] Starting conversion to MP3...")
 
-        job_id = start_conversion(file_id, "mp3")
-        print("job_id", job_id)
+            job_id = start_conversion(file_id, "mp3")
+            print("job_id", job_id)
 
 
-        time.sleep(10)
+            time.sleep(10)
 
-        logs.append("[Step 3/9] Checking job status...")
-        print("[Step 3/9] Checking job status...")
+            logs.append("[Step 3/9] Checking job status...")
+            print("[Step 3/9] Checking job status...")
 
-        job_data = get_job_status(job_id)
-        print("job_data", job_data)
+            job_data = get_job_status(job_id)
+            print("job_data", job_data)
 
-        # converted_task_id = next(
-        #     (task["id"] for task in job_data["tasks"] if task["operation"] == "convert" and task["status"] == "finished"),
-        #     None
-        # )
+            # converted_task_id = next(
+            #     (task["id"] for task in job_data["tasks"] if task["operation"] == "convert" and task["status"] == "finished"),
+            #     None
+            # )
 
-        converted_task_id = wait_for_job_completion(job_id)
-        print("converted_task_id", converted_task_id)
+            converted_task_id = wait_for_job_completion(job_id)
+            print("converted_task_id", converted_task_id)
 
-        if not converted_task_id:
-            logs.append("[Error] Conversion failed")
-            print("[Error] Conversion failed")
-            return {"error": "Conversion failed"}
+            if not converted_task_id:
+                logs.append("[Error] Conversion failed")
+                print("[Error] Conversion failed")
+                return {"error": "Conversion failed"}
 
-        logs.append("[Step 4/9] Creating export task...")
-        print("[Step 4/9] Creating export task...")
-        export_job_id = create_export_task(converted_task_id)
-        print("export_job_id", export_job_id)
+            logs.append("[Step 4/9] Creating export task...")
+            print("[Step 4/9] Creating export task...")
+            export_job_id = create_export_task(converted_task_id)
+            print("export_job_id", export_job_id)
 
 
-        logs.append("[Step 5/9] Getting export  URL...")
-        print("[Step 5/9] Getting export  URL...")
-        # audio_url = get_export_download_url(export_job_id)
-        audio_url = get_export_download_url_with_retry(export_job_id)
+            logs.append("[Step 5/9] Getting export  URL...")
+            print("[Step 5/9] Getting export  URL...")
+            # audio_url = get_export_download_url(export_job_id)
+            audio_url = get_export_download_url_with_retry(export_job_id)
 
 
-        print("audio_url", audio_url)
+            print("audio_url", audio_url)
 
 
-        if not audio_url:
-            logs.append("[Error] Export failed")
-            print("[Error] Export failed")
-            return {"error": "Export failed"}
+            if not audio_url:
+                logs.append("[Error] Export failed")
+                print("[Error] Export failed")
+                return {"error": "Export failed"}
 
         logs.append("[Step 6/9] Retrieving audio file...")
         print("[Step 6/9] Retrieving audio file...")
@@ -114,15 +215,22 @@ def process_video_task(file_bytes: bytes, filename: str):
         print("[Step 7/9] Transcribing audio...")
 
         # transcript = transcribe_audio(audio_path)
-        transcript = transcribe_audio(audio_url)
+        with scheduler.stage("transcribe", job):
+            transcript = transcribe_audio(audio_url)
         print("-----------Transcript is:", transcript)
 
+        if transcript:
+            index_result(filename, transcript=transcript)
+
         logs.append("[Step 8/9] Summarizing text...")
         print("[Step 8/9] Summarizing text...")
 
-        summary = summarize_text(transcript)
+        with scheduler.stage("summarize", job):
+            summary = summarize_text(transcript)
         print("-----------Summary is:", summary)
 
+        index_result(filename, transcript=transcript, summary=summary)
+
         logs.append("[Step 9/9] Processing complete.")
         print("[Step 9/9] Processing complete.")
 
@@ -136,12 +244,15 @@ def process_video_task(file_bytes: bytes, filename: str):
         print("Fetching Results")
         logs.append("Fetching Results")
         print("results[filename]", results[filename])
+        succeeded = True
         return results[filename] 
 
     except Exception as e:
         logs.append(f"[Error] Exception occurred 1: {str(e)}")
         print(f"[Error] Exception occurred 1: {str(e)}")
         return {"error": str(e)}
+    finally:
+        scheduler.finish(job, succeeded)
 
 @app.get("/results/{filename}")
 async def get_results(filename: str):
@@ -149,18 +260,50 @@ async def get_results(filename: str):
         return results[filename]
     return {"message": "Results not available yet"}
 
+@app.get("/search")
+def search(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    syntax: str = Query("plain", pattern="^(plain|fts5)$"),
+):
+    try:
+        hits = search_index.search(q, limit + 1, offset, raw=syntax == "fts5")
+    except sqlite3.OperationalError as e:
+        if not is_query_error(e):
+            raise
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {str(e)}")
+
+    return {
+        "query": q,
+        "limit": limit,
+        "offset": offset,
+        "syntax": syntax,
+        "has_more": len(hits) > limit,
+        "results": hits[:limit],
+    }
+
+def index_result(filename: str, transcript: str = None, summary: str = None):
+    """Adds or updates a single video's transcript/summary in the search index."""
+    try:
+        search_index.upsert(filename, transcript=transcript, summary=summary)
+    except sqlite3.Error as e:
+        # Indexing must never break the processing pipeline
+        logs.append(f"[Error] Failed to index {filename}: {str(e)}")
+        print(f"[Error] Failed to index {filename}: {str(e)}")
+
 def upload_to_cloudconvert(file_bytes: bytes, filename: str):
     url = f"{CLOUDCONVERT_URL}/import/upload"
     headers = {"Authorization": f"Bearer {CLOUDCONVERT_API_KEY}"}
 
-    response = requests.post(url, json={"filename": filename}, headers=headers)
+    response = get_http_session().post(url, json={"filename": filename}, headers=headers)
     response.raise_for_status()
 
     upload_data = response.json()["data"]
     upload_url = upload_data["result"]["form"]["url"]
     parameters = upload_data["result"]["form"]["parameters"]
 
-    requests.post(upload_url, files={"file": (filename, file_bytes, "video/mp4")}, data=parameters).raise_for_status()
+    get_http_session().post(upload_url, files={"file": (filename, file_bytes, "video/mp4")}, data=parameters).raise_for_status()
     return upload_data["id"]
 
 def start_conversion(file_id: str, output_format="mp3"):
@@ -168,7 +311,7 @@ def start_conversion(file_id: str, output_format="mp3"):
     headers = {"Authorization": f"Bearer {CLOUDCONVERT_API_KEY}", "Content-Type": "application/json"}
 
     data = {"tasks": {"convert": {"operation": "convert", "input": [file_id], "output_format": output_format}}}
-    response = requests.post(url, json=data, headers=headers)
+    response = get_http_session().post(url, json=data, headers=headers)
     response.raise_for_status()
     return response.json()["data"]["id"]
 
@@ -176,7 +319,7 @@ def get_job_status(job_id: str):
     url = f"{CLOUDCONVERT_URL}/jobs/{job_id}"
     headers = {"Authorization": f"Bearer {CLOUDCONVERT_API_KEY}"}
 
-    response = requests.get(url, headers=headers)
+    response = get_http_session().get(url, headers=headers)
     response.raise_for_status()
     return response.json()["data"]
 
@@ -216,7 +359,7 @@ def create_export_task(converted_task_id: str):
     headers = {"Authorization": f"Bearer {CLOUDCONVERT_API_KEY}", "Content-Type": "application/json"}
 
     data = {"tasks": {"export": {"operation": "export/url", "input": [converted_task_id]}}}
-    response = requests.post(url, json=data, headers=headers)
+    response = get_http_session().post(url, json=data, headers=headers)
     response.raise_for_status()
     return response.json()["data"]["id"]
 
@@ -224,7 +367,7 @@ def get_export_download_url(job_id: str):
     url = f"{CLOUDCONVERT_URL}/jobs/{job_id}"
     headers = {"Authorization": f"Bearer {CLOUDCONVERT_API_KEY}"}
 
-    response = requests.get(url, headers=headers)
+    response = get_http_session().get(url, headers=headers)
     response.raise_for_status()
 
     for task in response.json()["data"]["tasks"]:
@@ -244,7 +387,7 @@ def get_export_download_url_with_retry(job_id: str, retries=5, delay=5):
     return None  # Return None if retries fail
 
 def download_audio(audio_url: str, output_path="audio.mp3"):
-    response = requests.get(audio_url)
+    response = get_http_session().get(audio_url)
     response.raise_for_status()
 
     with open(output_path, "wb") as file:
@@ -258,7 +401,7 @@ def transcribe_audio(audio_url: str):
     print("Transcribe URL:", url)
 
     try:
-        audio_response = requests.get(audio_url, stream=True)
+        audio_response = get_http_session().get(audio_url, stream=True)
         print('aud res ', audio_response)
         if audio_response.status_code != 200:
             print("Error downloading audio file:", audio_response.status_code)
@@ -275,7 +418,7 @@ def transcribe_audio(audio_url: str):
         print('files', files)
 
 
-        response = requests.post(url, headers=headers, files=files, data=data)
+        response = get_http_session().post(url, headers=headers, files=files, data=data)
         response.raise_for_status()  # Raise an error if request fails
         
         print("Transcription Response:", response.json())
@@ -290,7 +433,7 @@ def summarize_text(text: str):
     headers = {"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"}
 
     data = {"model": "gpt-4", "messages": [{"role": "system", "content": "Summarize this transcript:"}, {"role": "user", "content": text}]}
-    response = requests.post(url, json=data, headers=headers)
+    response = get_http_session().post(url, json=data, headers=headers)
 
     response.raise_for_status()
     return response.json()["choices"][0]["message"]["content"]